@@ -1,27 +1,50 @@
+import hashlib
+import os
+import time
+from functools import lru_cache
+
 import dash
 from dash import dcc, html, dash_table, Input, Output, State
 import dash_bootstrap_components as dbc
+from flask_caching import Cache
 import plotly.express as px
+import plotly.io as pio
+import orjson
 import pandas as pd
+import requests
+
+from data import chart_aggregates, clean_sheet, fetch_sheet
+
+# Use orjson for all Plotly JSON encoding. Dash serializes callback responses
+# through plotly.io.json as well, so this also covers table rows and figure dicts.
+pio.json.config.default_engine = 'orjson'
+
+# Rows per page of the raw data table; pages are sliced server-side
+PAGE_SIZE = 10
+
+# Seconds a downloaded copy of the sheet is reused before fetching again
+CACHE_TTL = 60
+
+@lru_cache(maxsize=1)
+def _load_cached(bucket):
+    df = clean_sheet(fetch_sheet())
 
-# URL for the Google Sheet CSV export
-SHEET_URL = "https://docs.google.com/spreadsheets/d/1PIhDB-RqQguZl6kGb19_ZkXcVvMYJwMmflgaiZ0PDDQ/export?format=csv"
+    # Content hash of the sheet, used to key the memoized dashboard output
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    df.attrs['data_version'] = hashlib.blake2b(row_hashes.tobytes(), digest_size=8).hexdigest()
+    return df
 
-def load_data():
+def load_data(force_refresh=False):
+    # Filter changes reuse the sheet fetched within the current TTL bucket;
+    # only the refresh button forces a new download.
+    if force_refresh:
+        _load_cached.cache_clear()
     try:
-        df = pd.read_csv(SHEET_URL)
-        # Clean column names
-        df.columns = df.columns.str.strip()
-        
-        # Convert Timestamp to datetime
-        if 'Timestamp' in df.columns:
-            df['Timestamp'] = pd.to_datetime(df['Timestamp'], errors='coerce')
-            
-        # Convert CLOSED AMOUNT to numeric
-        if 'CLOSED AMOUNT' in df.columns:
-            df['CLOSED AMOUNT'] = pd.to_numeric(df['CLOSED AMOUNT'], errors='coerce').fillna(0)
-            
-        return df
+        # Shallow copy so callers never mutate the cached frame
+        return _load_cached(int(time.monotonic() // CACHE_TTL)).copy(deep=False)
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching data: {e}")
+        return pd.DataFrame()
     except Exception as e:
         print(f"Error loading data: {e}")
         return pd.DataFrame()
@@ -29,21 +52,33 @@ def load_data():
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.FLATLY])
 server = app.server
 
+# Memoized callback results; shared across workers when Redis is configured
+if os.environ.get('REDIS_URL'):
+    cache_config = {'CACHE_TYPE': 'RedisCache', 'CACHE_REDIS_URL': os.environ['REDIS_URL']}
+else:
+    cache_config = {'CACHE_TYPE': 'SimpleCache'}
+cache_config['CACHE_DEFAULT_TIMEOUT'] = CACHE_TTL
+cache = Cache(server, config=cache_config)
+
 # Initial data load for dropdown options
 df_initial = load_data()
 bde_options = [{'label': 'All BDEs', 'value': 'ALL'}]
 plan_options = [{'label': 'All Plans', 'value': 'ALL'}]
 
 if not df_initial.empty:
+    # Options come from the categorical columns' categories, not a scan of every row
     if 'BDE NAME' in df_initial.columns:
-        bdes = sorted(df_initial['BDE NAME'].dropna().unique().tolist())
+        bdes = df_initial['BDE NAME'].cat.categories.sort_values().tolist()
         bde_options += [{'label': bde, 'value': bde} for bde in bdes]
     
     if 'PLAN' in df_initial.columns:
-        plans = sorted(df_initial['PLAN'].dropna().unique().tolist())
+        plans = df_initial['PLAN'].cat.categories.sort_values().tolist()
         plan_options += [{'label': plan, 'value': plan} for plan in plans]
 
 app.layout = dbc.Container([
+    # Per-browser signatures of the last dashboard outputs, used to skip unchanged ones
+    dcc.Store(id='output-signatures'),
+
     dbc.Row([
         dbc.Col(html.H1("Response Visualizer", className="text-center text-primary mb-4"), width=12)
     ]),
@@ -134,7 +169,9 @@ app.layout = dbc.Container([
                 dbc.CardBody([
                     dash_table.DataTable(
                         id='data-table',
-                        page_size=10,
+                        page_action='custom',
+                        page_current=0,
+                        page_size=PAGE_SIZE,
                         style_table={'overflowX': 'auto'},
                         style_cell={'textAlign': 'left'},
                         style_header={
@@ -155,36 +192,85 @@ app.layout = dbc.Container([
      Output('bde-graph', 'figure'),
      Output('plan-graph', 'figure'),
      Output('timeline-graph', 'figure'),
-     Output('data-table', 'data'),
-     Output('data-table', 'columns')],
+     Output('data-table', 'columns'),
+     Output('data-table', 'page_count'),
+     Output('data-table', 'page_current'),
+     Output('output-signatures', 'data')],
     [Input('bde-filter', 'value'),
      Input('plan-filter', 'value'),
-     Input('refresh-btn', 'n_clicks')]
+     Input('refresh-btn', 'n_clicks')],
+    [State('output-signatures', 'data')]
+)
+def update_dashboard(selected_bde, selected_plan, n_clicks, last_sigs):
+    # Reuse the cached sheet on filter changes, reload on refresh
+    refresh = dash.ctx.triggered_id == 'refresh-btn'
+    df = load_data(force_refresh=refresh)
+    
+    if df.empty:
+        return "0", "₹0.00", {}, {}, {}, [], 0, 0, []
+
+    outputs = _compute(df, df.attrs['data_version'], selected_bde, selected_plan)
+    sigs = [output_signature(value) for value in outputs]
+
+    # Skip outputs the browser already shows; the refresh button rebuilds everything
+    previous = [] if refresh or not last_sigs else last_sigs
+    figure_slots = {2, 3, 4}
+    results = []
+    for i, (value, sig) in enumerate(zip(outputs, sigs)):
+        if i < len(previous) and previous[i] == sig:
+            results.append(dash.no_update)
+        elif i in figure_slots:
+            results.append(orjson.loads(value))
+        else:
+            results.append(value)
+
+    return (*results, 0, sigs)
+
+@app.callback(
+    Output('data-table', 'data'),
+    [Input('data-table', 'page_current')],
+    [State('bde-filter', 'value'),
+     State('plan-filter', 'value')]
 )
-def update_dashboard(selected_bde, selected_plan, n_clicks):
-    # Reload data on refresh or initial load
+def update_table_page(page_current, selected_bde, selected_plan):
+    # Only the visible page is converted to records and sent to the browser.
+    # Filter changes arrive via update_dashboard resetting page_current.
     df = load_data()
     
     if df.empty:
-        return "0", "₹0.00", {}, {}, {}, [], []
+        return []
 
-    # Apply Filters
+    df = filter_data(df, selected_bde, selected_plan)
+    start = (page_current or 0) * PAGE_SIZE
+    return df.iloc[start:start + PAGE_SIZE].to_dict('records')
+
+def filter_data(df, selected_bde, selected_plan):
     if selected_bde != 'ALL':
         df = df[df['BDE NAME'] == selected_bde]
     
     if selected_plan != 'ALL':
         df = df[df['PLAN'] == selected_plan]
 
+    return df
+
+def output_signature(value):
+    return hashlib.blake2b(orjson.dumps(value), digest_size=8).hexdigest()
+
+# Keyed on the sheet's content hash rather than the frame itself; figures are
+# cached as serialized JSON so repeat filter states skip Plotly serialization too.
+@cache.memoize(args_to_ignore=['df'])
+def _compute(df, data_version, selected_bde, selected_plan):
+    # Apply Filters
+    df = filter_data(df, selected_bde, selected_plan)
+
     # Metrics
     total_responses = len(df)
     total_closed_amount = df['CLOSED AMOUNT'].sum() if 'CLOSED AMOUNT' in df.columns else 0
+    aggregates = chart_aggregates(df)
     
     # 1. BDE Performance (Bar Chart)
-    if 'BDE NAME' in df.columns and not df.empty:
-        bde_metrics = df.groupby('BDE NAME').agg({
-            'BDE NAME': 'count',
-            'CLOSED AMOUNT': 'sum'
-        }).rename(columns={'BDE NAME': 'Count'}).reset_index()
+    if 'BDE NAME' in aggregates:
+        bde_metrics = aggregates['BDE NAME']
         
         fig_bde = px.bar(
             bde_metrics, 
@@ -199,16 +285,15 @@ def update_dashboard(selected_bde, selected_plan, n_clicks):
         fig_bde = px.bar(title="No Data Available")
 
     # 2. Plan Distribution (Pie Chart)
-    if 'PLAN' in df.columns and not df.empty:
-        plan_counts = df['PLAN'].value_counts().reset_index()
-        plan_counts.columns = ['PLAN', 'Count']
+    if 'PLAN' in aggregates:
+        plan_counts = aggregates['PLAN']
         fig_plan = px.pie(plan_counts, values='Count', names='PLAN', title='Plan Distribution', hole=0.3)
     else:
         fig_plan = px.pie(title="No Data Available")
 
     # 3. Timeline (Line Chart)
-    if 'Timestamp' in df.columns and not df.empty:
-        daily_counts = df.groupby(df['Timestamp'].dt.date).size().reset_index(name='Count')
+    if 'Timestamp' in aggregates:
+        daily_counts = aggregates['Timestamp']
         fig_timeline = px.line(daily_counts, x='Timestamp', y='Count', title='Responses Over Time', markers=True)
         fig_timeline.update_layout(xaxis_title="Date", yaxis_title="Number of Responses")
     else:
@@ -216,15 +301,16 @@ def update_dashboard(selected_bde, selected_plan, n_clicks):
 
     # Table Columns
     columns = [{'name': i, 'id': i} for i in df.columns]
+    page_count = max(1, -(-total_responses // PAGE_SIZE))
     
     return (
         f"{total_responses}",
         f"₹{total_closed_amount:,.2f}",
-        fig_bde,
-        fig_plan,
-        fig_timeline,
-        df.to_dict('records'),
-        columns
+        fig_bde.to_json(),
+        fig_plan.to_json(),
+        fig_timeline.to_json(),
+        columns,
+        page_count
     )
 
 if __name__ == '__main__':
@@ -0,0 +1,89 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import requests
+from pandas.tseries.api import guess_datetime_format
+
+# URL for the Google Sheet CSV export
+SHEET_URL = "https://docs.google.com/spreadsheets/d/1PIhDB-RqQguZl6kGb19_ZkXcVvMYJwMmflgaiZ0PDDQ/export?format=csv"
+
+# Google Sheets export layouts for the form's timestamp and date answers, used
+# when the layout can't be guessed from the data itself
+TIMESTAMP_FORMAT = '%m/%d/%Y %H:%M:%S'
+DATE_FORMAT = '%m/%d/%Y'
+
+# Columns the CSV reader can parse straight to their final dtype
+CSV_DTYPES = {'BDE NAME': 'category', 'PLAN': 'category'}
+
+# Below this many rows the chart aggregations finish before a thread pool would start
+PARALLEL_MIN_ROWS = 10_000
+
+def parse_datetime(values, default_fmt):
+    # Guess the layout from the first value, as pandas' own inference does, so
+    # day-first sheets parse the same as before; then parse in one fixed-format pass
+    non_null = values.dropna()
+    fmt = guess_datetime_format(str(non_null.iloc[0])) if not non_null.empty else None
+    return pd.to_datetime(values, format=fmt or default_fmt, errors='coerce', cache=True)
+
+def fetch_sheet():
+    # Explicit fetch with a timeout instead of letting pandas open the URL
+    resp = requests.get(SHEET_URL, timeout=10)
+    resp.raise_for_status()
+    return pd.read_csv(io.BytesIO(resp.content), dtype=CSV_DTYPES, engine='c', low_memory=False)
+
+def clean_sheet(df):
+    # Clean column names
+    df.columns = df.columns.str.strip()
+    
+    # Convert Timestamp to datetime
+    if 'Timestamp' in df.columns:
+        df['Timestamp'] = parse_datetime(df['Timestamp'], TIMESTAMP_FORMAT)
+        
+    # Convert CLOSED AMOUNT to numeric
+    if 'CLOSED AMOUNT' in df.columns:
+        df['CLOSED AMOUNT'] = pd.to_numeric(df['CLOSED AMOUNT'], errors='coerce').fillna(0)
+
+    # Low-cardinality filter/group keys; categorical codes make masks and groupbys integer ops
+    for col in ('BDE NAME', 'PLAN'):
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+
+    return df
+
+def aggregate_bde(df):
+    # Response count and revenue per BDE via bincount over the category codes
+    categories = df['BDE NAME'].cat.categories
+    codes = df['BDE NAME'].cat.codes.to_numpy()
+    valid = codes >= 0
+    amounts = df['CLOSED AMOUNT'].to_numpy(dtype=np.float64)[valid]
+    counts = np.bincount(codes[valid], minlength=len(categories))
+    revenue = np.bincount(codes[valid], weights=amounts, minlength=len(categories))
+    # Drop BDEs filtered out of this view
+    observed = counts > 0
+    return pd.DataFrame({
+        'BDE NAME': categories[observed],
+        'Count': counts[observed],
+        'CLOSED AMOUNT': revenue[observed]
+    })
+
+def count_plans(df):
+    return df.groupby('PLAN', observed=True).size().reset_index(name='Count')
+
+def count_daily(df):
+    # Floor to day keeps datetime64 keys instead of Python date objects
+    return df['Timestamp'].dt.floor('D').value_counts().sort_index().rename_axis('Timestamp').reset_index(name='Count')
+
+def chart_aggregates(df):
+    # Chart inputs keyed by the column each one needs; absent columns are skipped
+    if df.empty:
+        return {}
+    aggregations = (('BDE NAME', aggregate_bde), ('PLAN', count_plans), ('Timestamp', count_daily))
+    tasks = {col: func for col, func in aggregations if col in df.columns}
+    if len(df) < PARALLEL_MIN_ROWS or len(tasks) < 2:
+        return {col: func(df) for col, func in tasks.items()}
+    # The aggregations are independent and pandas/numpy release the GIL in their kernels
+    with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+        futures = {col: executor.submit(func, df) for col, func in tasks.items()}
+    return {col: future.result() for col, future in futures.items()}
@@ -1,9 +1,9 @@
 import pandas as pd
 
-url = "https://docs.google.com/spreadsheets/d/1PIhDB-RqQguZl6kGb19_ZkXcVvMYJwMmflgaiZ0PDDQ/export?format=csv"
+from data import SHEET_URL
 
 try:
-    df = pd.read_csv(url)
+    df = pd.read_csv(SHEET_URL)
     print("Columns:", df.columns.tolist())
     print("First few rows:")
     print(df.head())
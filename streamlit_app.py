@@ -1,8 +1,12 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
-import matplotlib.pyplot as plt
+from PIL import Image, ImageDraw, ImageFont
 import io
+import requests
+
+from data import DATE_FORMAT, chart_aggregates, clean_sheet, fetch_sheet, parse_datetime
 
 # Page configuration
 st.set_page_config(
@@ -11,108 +15,119 @@ st.set_page_config(
     layout="wide"
 )
 
-# URL for the Google Sheet CSV export
-SHEET_URL = "https://docs.google.com/spreadsheets/d/1PIhDB-RqQguZl6kGb19_ZkXcVvMYJwMmflgaiZ0PDDQ/export?format=csv"
-
 @st.cache_data(ttl=60)
 def load_data():
     try:
-        df = pd.read_csv(SHEET_URL)
-        # Clean column names
-        df.columns = df.columns.str.strip()
-        
-        # Convert Timestamp to datetime
-        if 'Timestamp' in df.columns:
-            df['Timestamp'] = pd.to_datetime(df['Timestamp'], errors='coerce')
+        df = clean_sheet(fetch_sheet())
 
         # Convert Expected Closure Date to datetime
         if 'Expected Closure Date' in df.columns:
-            df['Expected Closure Date'] = pd.to_datetime(df['Expected Closure Date'], errors='coerce')
-            
-        # Convert CLOSED AMOUNT to numeric
-        if 'CLOSED AMOUNT' in df.columns:
-            df['CLOSED AMOUNT'] = pd.to_numeric(df['CLOSED AMOUNT'], errors='coerce').fillna(0)
+            df['Expected Closure Date'] = parse_datetime(df['Expected Closure Date'], DATE_FORMAT)
+            # Day-level closure date, normalized once; rows are kept in closure order so
+            # the closure insights can binary-search date ranges instead of masking
+            df['_closure_day'] = df['Expected Closure Date'].dt.normalize()
+            df = df.sort_values('_closure_day', kind='stable')
             
         return df
+    except requests.exceptions.RequestException as e:
+        st.error(f"Error fetching data: {e}")
+        return pd.DataFrame()
     except Exception as e:
         st.error(f"Error loading data: {e}")
         return pd.DataFrame()
 
+def load_font(size, bold=False):
+    # DejaVu ships with most Linux images; fall back to Pillow's bundled font
+    try:
+        return ImageFont.truetype('DejaVuSans-Bold.ttf' if bold else 'DejaVuSans.ttf', size)
+    except OSError:
+        return ImageFont.load_default(size=size)
+
+# Reruns with the same report date and rows reuse the rendered PNG bytes
+@st.cache_data(show_spinner=False, max_entries=16)
 def generate_eod_image(date_str, df):
     # Prepare data for table
-    table_data = []
     headers = ['BDE Name', 'Company', 'Plan', 'Exp. Closure']
     
     # Sort by BDE
-    if 'BDE NAME' in df.columns:
+    if 'BDE NAME' in df.columns and isinstance(df['BDE NAME'].dtype, pd.CategoricalDtype):
+        # Categories are sorted, so an integer sort on the codes orders by name;
+        # missing names (code -1) go last, as sort_values would place them
+        codes = df['BDE NAME'].cat.codes.to_numpy()
+        codes = np.where(codes < 0, len(df['BDE NAME'].cat.categories), codes)
+        df_sorted = df.iloc[np.argsort(codes, kind='stable')]
+    elif 'BDE NAME' in df.columns:
         df_sorted = df.sort_values('BDE NAME')
     else:
         df_sorted = df
         
-    for _, row in df_sorted.iterrows():
-        bde = str(row.get('BDE NAME', 'N/A'))
-        # Truncate company name if too long
-        company = str(row.get('COMPANY NAME', 'N/A'))
-        if len(company) > 20:
-            company = company[:17] + "..."
-            
-        plan = str(row.get('PLAN', 'N/A'))
-        
-        exp_closure = row.get('Expected Closure Date', pd.NaT)
-        if pd.notna(exp_closure):
-            # Format as DD-Mon (e.g., 30-Nov)
-            exp_closure_str = exp_closure.strftime('%d-%b')
-        else:
-            exp_closure_str = "-"
-            
-        table_data.append([bde, company, plan, exp_closure_str])
+    def column_as_str(col):
+        if col in df_sorted.columns:
+            return df_sorted[col].astype(object).fillna('N/A').astype(str)
+        return pd.Series('N/A', index=df_sorted.index)
+
+    bde = column_as_str('BDE NAME')
+    # Truncate company name if too long
+    company = column_as_str('COMPANY NAME')
+    company = company.where(company.str.len() <= 20, company.str.slice(0, 17) + "...")
+    plan = column_as_str('PLAN')
+
+    if 'Expected Closure Date' in df_sorted.columns:
+        # Format as DD-Mon (e.g., 30-Nov)
+        exp_closure = df_sorted['Expected Closure Date'].dt.strftime('%d-%b').fillna("-")
+    else:
+        exp_closure = pd.Series("-", index=df_sorted.index)
+
+    table_data = [list(row) for row in zip(bde, company, plan, exp_closure)]
         
     # Add Total Row
     table_data.append(['TOTAL', f"{len(df)} Responses", "", ""])
 
-    # Calculate figure height
+    # Layout (pixels)
+    width, margin = 1800, 40
+    title_height, row_height = 100, 60
+    col_widths = [0.2, 0.35, 0.25, 0.2]
+    table_width = width - 2 * margin
+    col_edges = [margin + int(sum(col_widths[:i]) * table_width) for i in range(len(col_widths) + 1)]
+    
     # Header + Rows
-    num_rows = len(table_data) + 1 
-    # Base height 1.0 + 0.5 per row
-    fig_height = 1.0 + (num_rows * 0.5)
+    rows = [headers] + table_data
+    height = title_height + len(rows) * row_height + margin
     
-    fig, ax = plt.subplots(figsize=(12, fig_height))
-    ax.axis('off')
+    img = Image.new('RGB', (width, height), 'white')
+    draw = ImageDraw.Draw(img)
+    font = load_font(24)
+    bold_font = load_font(24, bold=True)
     
     # Title
-    ax.set_title(f"EOD Report - {date_str}", fontsize=16, weight='bold', pad=20)
+    draw.text((width // 2, title_height // 2), f"EOD Report - {date_str}", font=load_font(32, bold=True), fill='black', anchor='mm')
     
     # Table
-    the_table = ax.table(cellText=table_data,
-                         colLabels=headers,
-                         loc='center',
-                         cellLoc='left',
-                         colWidths=[0.2, 0.35, 0.25, 0.2])
-    
-    the_table.auto_set_font_size(False)
-    the_table.set_fontsize(12)
-    the_table.scale(1, 2) # Increase row height
-    
-    # Styling
-    for (row, col), cell in the_table.get_celld().items():
-        if row == 0: # Header
-            cell.set_text_props(weight='bold', color='white')
-            cell.set_facecolor('#40466e')
-        elif row == len(table_data): # Total row
-            cell.set_text_props(weight='bold')
-            cell.set_facecolor('#f0f2f6')
+    for i, row in enumerate(rows):
+        top = title_height + i * row_height
+        if i == 0: # Header
+            fill, color, cell_font = '#40466e', 'white', bold_font
+        elif i == len(rows) - 1: # Total row
+            fill, color, cell_font = '#f0f2f6', 'black', bold_font
+        else:
+            fill, color, cell_font = 'white', 'black', font
             
-    plt.tight_layout()
+        for left, right, cell in zip(col_edges, col_edges[1:], row):
+            draw.rectangle([left, top, right, top + row_height], fill=fill, outline='black')
+            draw.text((left + 10, top + row_height // 2), cell, font=cell_font, fill=color, anchor='lm')
     
     buf = io.BytesIO()
-    plt.savefig(buf, format='png', dpi=150, bbox_inches='tight')
-    buf.seek(0)
-    plt.close(fig)
-    return buf
+    img.save(buf, format='PNG', compress_level=6)
+    return buf.getvalue()
 
 def main():
     st.title("📊 Response Visualizer")
 
+    # Reference dates for this rerun, as day-precision numpy scalars for the masks
+    today_date = pd.Timestamp.now().date()
+    today = np.datetime64(today_date, 'D')
+    week_end = today + np.timedelta64(7, 'D')
+
     df = load_data()
     
     if df.empty:
@@ -123,11 +138,11 @@ def main():
     st.sidebar.header("Filters")
     
     # BDE Filter
-    bde_options = ['All BDEs'] + sorted(df['BDE NAME'].dropna().unique().tolist()) if 'BDE NAME' in df.columns else ['All BDEs']
+    bde_options = ['All BDEs'] + df['BDE NAME'].cat.categories.tolist() if 'BDE NAME' in df.columns else ['All BDEs']
     selected_bde = st.sidebar.selectbox("Filter by BDE", bde_options)
     
     # Plan Filter
-    plan_options = ['All Plans'] + sorted(df['PLAN'].dropna().unique().tolist()) if 'PLAN' in df.columns else ['All Plans']
+    plan_options = ['All Plans'] + df['PLAN'].cat.categories.tolist() if 'PLAN' in df.columns else ['All Plans']
     selected_plan = st.sidebar.selectbox("Filter by Plan", plan_options)
     
     # Date Range Filter
@@ -138,7 +153,7 @@ def main():
     if enable_date_filter:
         date_range = st.sidebar.date_input(
             "Select Date Range",
-            value=(pd.Timestamp.now().date(), pd.Timestamp.now().date()),
+            value=(today_date, today_date),
             key="dashboard_date_range"
         )
         if isinstance(date_range, tuple):
@@ -152,19 +167,23 @@ def main():
         st.cache_data.clear()
         st.rerun()
 
-    # Apply BDE & Plan Filters (Base Data)
-    base_df = df.copy()
+    # Apply BDE & Plan Filters (Base Data) as one combined mask; boolean
+    # indexing already returns a new frame, so no defensive copies are needed
+    conditions = []
     if selected_bde != 'All BDEs':
-        base_df = base_df[base_df['BDE NAME'] == selected_bde]
+        conditions.append(df['BDE NAME'] == selected_bde)
     
     if selected_plan != 'All Plans':
-        base_df = base_df[base_df['PLAN'] == selected_plan]
+        conditions.append(df['PLAN'] == selected_plan)
+
+    base_df = df[np.logical_and.reduce(conditions)] if conditions else df
 
     # Apply Date Filter for Dashboard Views
-    filtered_df = base_df.copy()
+    filtered_df = base_df
     if enable_date_filter and start_date and end_date and 'Timestamp' in filtered_df.columns:
-        # Filter by Timestamp (Response Date)
-        mask = (filtered_df['Timestamp'].dt.date >= start_date) & (filtered_df['Timestamp'].dt.date <= end_date)
+        # Filter by Timestamp (Response Date) against datetime64 bounds, not per-row date objects
+        timestamps = filtered_df['Timestamp']
+        mask = (timestamps >= np.datetime64(start_date, 'D')) & (timestamps < np.datetime64(end_date, 'D') + np.timedelta64(1, 'D'))
         filtered_df = filtered_df[mask]
 
     # Metrics
@@ -186,11 +205,12 @@ def main():
         # Date Picker for EOD Report
         col_date, _ = st.columns([1, 3])
         with col_date:
-            report_date = st.date_input("Select Date for Report", value=pd.Timestamp.now().date(), key="eod_date_picker")
+            report_date = st.date_input("Select Date for Report", value=today_date, key="eod_date_picker")
         
         # Filter base_df (which has BDE/Plan filters but NO date range filter) by the specific report date
-        report_date_ts = pd.Timestamp(report_date)
-        daily_responses = base_df[base_df['Timestamp'].dt.date == report_date]
+        report_day = np.datetime64(report_date, 'D')
+        timestamps = base_df['Timestamp']
+        daily_responses = base_df[(timestamps >= report_day) & (timestamps < report_day + np.timedelta64(1, 'D'))]
         
         col_today1, col_today2 = st.columns([2, 1])
         
@@ -206,13 +226,13 @@ def main():
             st.write(f"### EOD Report ({report_date.strftime('%d-%b')})")
             if not daily_responses.empty:
                 # Generate Image
-                img_buf = generate_eod_image(report_date.strftime('%Y-%m-%d'), daily_responses)
+                img_bytes = generate_eod_image(report_date.strftime('%Y-%m-%d'), daily_responses)
                 
-                st.image(img_buf, caption=f"EOD Report - {report_date.strftime('%d-%b')}", use_container_width=True)
+                st.image(img_bytes, caption=f"EOD Report - {report_date.strftime('%d-%b')}", use_container_width=True)
                 
                 st.download_button(
                     label="📥 Download EOD Report (PNG)",
-                    data=img_buf,
+                    data=img_bytes,
                     file_name=f"EOD_Report_{report_date.strftime('%Y-%m-%d')}.png",
                     mime="image/png"
                 )
@@ -225,16 +245,17 @@ def main():
     st.subheader("📅 Closure Insights")
     
     if 'Expected Closure Date' in filtered_df.columns:
-        today = pd.Timestamp.now().normalize()
+        # Filtering preserves load_data's closure-date order, so each window is a contiguous slice
+        closure_day = filtered_df['_closure_day'].to_numpy()
+        today_start = np.searchsorted(closure_day, today, side='left')
+        today_end = np.searchsorted(closure_day, today, side='right')
+        week_stop = np.searchsorted(closure_day, week_end, side='right')
         
         # Today's Closures
-        todays_closures = filtered_df[filtered_df['Expected Closure Date'].dt.normalize() == today]
+        todays_closures = filtered_df.iloc[today_start:today_end]
         
         # Upcoming Closures (Next 7 days)
-        upcoming_closures = filtered_df[
-            (filtered_df['Expected Closure Date'].dt.normalize() > today) & 
-            (filtered_df['Expected Closure Date'].dt.normalize() <= today + pd.Timedelta(days=7))
-        ]
+        upcoming_closures = filtered_df.iloc[today_end:week_stop]
         
         tab1, tab2 = st.tabs(["Today's Closures", "Upcoming Closures (Next 7 Days)"])
         
@@ -253,7 +274,7 @@ def main():
         with tab2:
             if not upcoming_closures.empty:
                 st.dataframe(
-                    upcoming_closures[cols_to_show].sort_values('Expected Closure Date'),
+                    upcoming_closures[cols_to_show],
                     use_container_width=True
                 )
             else:
@@ -264,14 +285,12 @@ def main():
     st.markdown("---")
 
     # Charts
+    aggregates = chart_aggregates(filtered_df)
     col_chart1, col_chart2 = st.columns(2)
 
     with col_chart1:
-        if 'BDE NAME' in filtered_df.columns and not filtered_df.empty:
-            bde_metrics = filtered_df.groupby('BDE NAME').agg({
-                'BDE NAME': 'count',
-                'CLOSED AMOUNT': 'sum'
-            }).rename(columns={'BDE NAME': 'Count'}).reset_index()
+        if 'BDE NAME' in aggregates:
+            bde_metrics = aggregates['BDE NAME']
             
             fig_bde = px.bar(
                 bde_metrics, 
@@ -292,24 +311,23 @@ def main():
             st.info("No BDE data available for charts.")
 
     with col_chart2:
-        if 'PLAN' in filtered_df.columns and not filtered_df.empty:
-            plan_counts = filtered_df['PLAN'].value_counts().reset_index()
-            plan_counts.columns = ['PLAN', 'Count']
+        if 'PLAN' in aggregates:
+            plan_counts = aggregates['PLAN']
             fig_plan = px.pie(plan_counts, values='Count', names='PLAN', title='Plan Distribution', hole=0.3)
             st.plotly_chart(fig_plan, use_container_width=True)
         else:
             st.info("No Plan data available for charts.")
 
     # Timeline
-    if 'Timestamp' in filtered_df.columns and not filtered_df.empty:
-        daily_counts = filtered_df.groupby(filtered_df['Timestamp'].dt.date).size().reset_index(name='Count')
+    if 'Timestamp' in aggregates:
+        daily_counts = aggregates['Timestamp']
         fig_timeline = px.line(daily_counts, x='Timestamp', y='Count', title='Responses Over Time', markers=True)
         fig_timeline.update_layout(xaxis_title="Date", yaxis_title="Number of Responses")
         st.plotly_chart(fig_timeline, use_container_width=True)
 
     # Raw Data
     st.subheader("Raw Data")
-    st.dataframe(filtered_df)
+    st.dataframe(filtered_df.drop(columns=['_closure_day'], errors='ignore'))
 
 if __name__ == "__main__":
     main()